@@ -1,9 +1,10 @@
 import asyncio
-import json
 import random
 import string
-from typing import TYPE_CHECKING
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
 
+import orjson
 import websockets
 from websockets import ConnectionClosed
 
@@ -13,36 +14,48 @@ from lib.constants import (
     CONQUEST_WIN_THRESHOLD,
     DEBUG_MODE,
     GRAPH_ENABLED,
+    PING_INTERVAL,
     SERVER_WS,
     SPAWN_PHASE_DURATION,
+    WS_WRITE_LIMIT,
 )
 from lib.metrics import GameMetrics
-from lib.player_state import PlayerState
 from lib.utils import Action
 
 if TYPE_CHECKING:
     from lib.enemy import Enemy
+    from lib.player_state import PlayerState
+    from lib.utils import AgentAction
+
+
+ID_ALPHABET = string.ascii_letters + string.digits
+TYPE_PREFIX = b'{"type":"'
+HANDLED_PREFIXES = (b'{"type":"state"', b'{"type":"created"')
 
 
 def make_id(length: int = 8) -> str:
-    alphabet = string.ascii_letters + string.digits
-    return "".join(random.choice(alphabet) for _ in range(length))
+    return "".join(random.choices(ID_ALPHABET, k=length))
+
+
+@dataclass(slots=True)
+class ActionContext:
+    bot: BotConnection
+    player: PlayerState
 
 
 class SpawnAction:
-    async def execute(self, ws, action: dict, context: dict) -> None:
-        await context["bot"].handle_spawn_action(ws, action)
+    async def execute(self, ws, action: AgentAction, ctx: ActionContext) -> None:
+        await ctx.bot.handle_spawn_action(ws, action)
 
 
 class AttackAction:
-    async def execute(self, ws, action: dict, context: dict) -> None:
-        player = PlayerState(context["state"])
-        await context["bot"].handle_attack_action(ws, action, player)
+    async def execute(self, ws, action: AgentAction, ctx: ActionContext) -> None:
+        await ctx.bot.handle_attack_action(ws, action, ctx.player)
 
 
 class BuildAction:
-    async def execute(self, ws, action: dict, context: dict) -> None:
-        await context["bot"].handle_build_action(ws, action)
+    async def execute(self, ws, action: AgentAction, ctx: ActionContext) -> None:
+        await ctx.bot.handle_build_action(ws, action)
 
 
 class BotConnection(ConnectionHandler):
@@ -57,28 +70,75 @@ class BotConnection(ConnectionHandler):
         self.metrics = GameMetrics() if GRAPH_ENABLED else None
         self.game_count = 0
         self.previous_owned_count: int = 0
+        self.victory: bool = False
+        self._last_tick_marker: bytes | None = None
+        self._outbox: asyncio.Queue[tuple[Any, bytes]] = asyncio.Queue()
+        self._report_task: asyncio.Task[None] | None = None
         self.actions = {
-            Action.SPAWN.value: SpawnAction(),
-            Action.ATTACK.value: AttackAction(),
-            Action.BUILD.value: BuildAction(),
+            Action.SPAWN: SpawnAction(),
+            Action.ATTACK: AttackAction(),
+            Action.BUILD: BuildAction(),
         }
+        # Per-tick messages reuse these templates; intents are serialized
+        # immediately, so only the changing fields are rewritten per send.
+        self._attack_intent = {
+            "type": Action.ATTACK,
+            "clientID": self.client_id,
+            "attackerID": None,
+            "targetID": None,
+            "x": 0,
+            "y": 0,
+            "troops": 0,
+        }
+        self._build_intent = {
+            "type": Action.BUILD,
+            "clientID": self.client_id,
+            "player": None,
+            "unit": None,
+            "x": -1,
+            "y": -1,
+        }
+        self._ping_msg = {"type": "ping", "clientID": self.client_id, "gameID": None}
+        self._intent_prefix = (
+            b'{"type":"intent","clientID":'
+            + orjson.dumps(self.client_id)
+            + b',"gameID":'
+        )
 
     def debug_print_state(self, state: dict) -> None:
-        if DEBUG_MODE:
-            print("\n" + "=" * 80)
-            print(f"=== RAW STATE (Tick {state.get('tick', '?')}) ===")
-            print(json.dumps(state, indent=2))
-            print("=" * 80 + "\n")
+        print("\n" + "=" * 80)
+        print(f"=== RAW STATE (Tick {state.get('tick', '?')}) ===")
+        print(orjson.dumps(state, option=orjson.OPT_INDENT_2).decode())
+        print("=" * 80 + "\n")
+
+    def send_intent(self, ws, intent: dict) -> None:
+        self._outbox.put_nowait((ws, orjson.dumps(intent)))
+
+    def send_game_intent(self, ws, intent: dict) -> None:
+        """Send ``intent`` wrapped in the intent envelope for the current game."""
+        payload = b"".join(
+            (
+                self._intent_prefix,
+                orjson.dumps(self.current_game_id),
+                b',"intent":',
+                orjson.dumps(intent),
+                b"}",
+            )
+        )
+        self._outbox.put_nowait((ws, payload))
 
-    async def send_intent(self, ws, intent: dict, log_prefix: str = "INTENT") -> None:
-        try:
-            payload = json.dumps(intent, separators=(",", ":"))
-        except Exception:
-            payload = str(intent)
+    async def writer_loop(self) -> None:
         try:
-            await ws.send(payload)
-        except Exception as e:
-            print(f"Failed to send {log_prefix}:", e)
+            while self.running:
+                batch = [await self._outbox.get()]
+                while not self._outbox.empty():
+                    batch.append(self._outbox.get_nowait())
+                for ws, payload in batch:
+                    # orjson emits UTF-8 already; send it as a text frame
+                    # without a decode/encode round-trip.
+                    await ws.send(payload, text=True)
+        except (asyncio.CancelledError, ConnectionClosed):
+            pass
 
     def sync_player_state(self, player: PlayerState) -> None:
         if player.player_id:
@@ -86,43 +146,37 @@ class BotConnection(ConnectionHandler):
             if player.owned_count > 0 or player.population > 0:
                 self.has_spawned = True
 
-    async def send_action(self, ws, action: dict) -> None:
-        state = self.env.current_state or {}
-        player = PlayerState(state)
+    async def send_action(self, ws, action: AgentAction) -> None:
+        player = self.env.current_player
         self.sync_player_state(player)
 
-        action_type = action.get("type")
-        if action_type:
-            handler = self.actions.get(action_type)
-            if handler:
-                await handler.execute(ws, action, {"bot": self, "state": state})
+        handler = self.actions.get(action.type)
+        if handler:
+            await handler.execute(ws, action, ActionContext(self, player))
 
-    async def handle_spawn_action(self, ws, action: dict) -> None:
+    async def handle_spawn_action(self, ws, action: AgentAction) -> None:
         if self.has_spawned:
             return
 
         player_id = self.player_id or make_id(8)
         self.player_id = player_id
 
-        intent_msg = {
-            "type": "intent",
+        intent = {
+            "type": Action.SPAWN,
             "clientID": self.client_id,
-            "gameID": self.current_game_id,
-            "intent": {
-                "type": Action.SPAWN.value,
-                "clientID": self.client_id,
-                "playerID": player_id,
-                "flag": None,
-                "name": self.username,
-                "playerType": "HUMAN",
-                "x": action.get("x"),
-                "y": action.get("y"),
-            },
+            "playerID": player_id,
+            "flag": None,
+            "name": self.username,
+            "playerType": "HUMAN",
+            "x": action.x,
+            "y": action.y,
         }
         self.has_spawned = True
-        await self.send_intent(ws, intent_msg, "SPAWN")
+        self.send_game_intent(ws, intent)
 
-    async def handle_attack_action(self, ws, action: dict, player: PlayerState) -> None:
+    async def handle_attack_action(
+        self, ws, action: AgentAction, player: PlayerState
+    ) -> None:
         if self.player_id is None:
             print("Warning: Cannot send attack intent - player_id not set")
             return
@@ -134,65 +188,58 @@ class BotConnection(ConnectionHandler):
         target_player_id = target.owner_player_id
         troops = self.calculate_attack_troops(action, player)
 
-        intent_attack = {
-            "type": "intent",
-            "clientID": self.client_id,
-            "gameID": self.current_game_id,
-            "intent": {
-                "type": Action.ATTACK.value,
-                "clientID": self.client_id,
-                "attackerID": self.player_id,
-                "targetID": target_player_id,
-                "x": target.x,
-                "y": target.y,
-                "troops": troops,
-            },
-        }
-        await self.send_intent(ws, intent_attack, "ATTACK")
+        intent = self._attack_intent
+        intent["attackerID"] = self.player_id
+        intent["targetID"] = target_player_id
+        intent["x"] = target.x
+        intent["y"] = target.y
+        intent["troops"] = troops
+        self.send_game_intent(ws, intent)
 
-    async def handle_build_action(self, ws, action: dict) -> None:
+    async def handle_build_action(self, ws, action: AgentAction) -> None:
         if self.player_id is None:
             print("Warning: Cannot send build intent - player_id not set")
             return
 
-        unit = action.get("unit")
-        intent_build = {
-            "type": "intent",
-            "clientID": self.client_id,
-            "gameID": self.current_game_id,
-            "intent": {
-                "type": Action.BUILD.value,
-                "clientID": self.client_id,
-                "player": self.player_id,
-                "unit": unit,
-                "x": -1,
-                "y": -1,
-            },
-        }
-        await self.send_intent(ws, intent_build, f"BUILD {unit}")
-
-    def find_attack_target(self, action: dict, player: PlayerState) -> Enemy | None:
-        neighbor_index = action.get("neighbor_index")
-        if (
-            neighbor_index is None
-            or neighbor_index < 0
-            or neighbor_index >= len(player.enemies)
-        ):
+        unit = action.unit
+        intent = self._build_intent
+        intent["player"] = self.player_id
+        intent["unit"] = unit
+        self.send_game_intent(ws, intent)
+
+    def find_attack_target(
+        self, action: AgentAction, player: PlayerState
+    ) -> Enemy | None:
+        neighbor_index = action.neighbor_index
+        enemies = player.enemies
+        if neighbor_index is None or not 0 <= neighbor_index < len(enemies):
             return None
 
-        return player.enemies[neighbor_index]
+        return enemies[neighbor_index]
 
-    def calculate_attack_troops(self, action: dict, player: PlayerState) -> int:
-        troops_ratio = action.get("ratio", 0.5)
-        try:
-            normalized_ratio = max(0.0, min(1.0, float(troops_ratio)))
-            return int(normalized_ratio * player.population)
-        except (ValueError, TypeError):
+    def calculate_attack_troops(self, action: AgentAction, player: PlayerState) -> int:
+        ratio = action.ratio if action.ratio is not None else 0.5
+        if ratio <= 0.0:
             return 0
+        if ratio >= 1.0:
+            return player.population
+        return int(ratio * player.population)
+
+    async def process_message(self, message: bytes) -> None:
+        # Servers may re-broadcast an unchanged state; skip the parse when the
+        # frame header carries the tick that was just processed.
+        if (
+            self._last_tick_marker is not None
+            and self._last_tick_marker in message[:64]
+        ):
+            return
+
+        # Compact frames that lead with a type we ignore are dropped unparsed.
+        if message.startswith(TYPE_PREFIX) and not message.startswith(HANDLED_PREFIXES):
+            return
 
-    async def process_message(self, message: str) -> None:
         try:
-            state = json.loads(message)
+            state = orjson.loads(message)
         except Exception:
             return
 
@@ -201,6 +248,7 @@ class BotConnection(ConnectionHandler):
             self.current_game_id = state.get("gameID")
             self.has_spawned = False
             self.previous_owned_count = 0
+            self._last_tick_marker = None
             print(f"Started new game {self.current_game_id}")
             self.agent.total_reward = 0
             if self.metrics:
@@ -209,35 +257,39 @@ class BotConnection(ConnectionHandler):
         if msg_type != "state":
             return
 
-        self.debug_print_state(state)
+        if DEBUG_MODE:
+            self.debug_print_state(state)
 
-        player = PlayerState(state)
         self.env.update_state(state)
-        self.previous_owned_count = player.owned_count
-
-        self.handle_fail_spawn(player)
-        self.handle_victory(player)
-        self.handle_game_over(
-            player.owned_count, player.population, player.conquest_percent
-        )
-
-    def handle_fail_spawn(self, player: PlayerState) -> None:
+        player = self.env.current_player
+        tick = player.tick
+        owned_count = player.owned_count
+        conquest_pct = player.conquest_percent
+        self._last_tick_marker = f'"tick":{tick},'.encode()
+        self.previous_owned_count = owned_count
+
+        self.handle_fail_spawn(tick, owned_count, in_spawn_phase=player.in_spawn_phase)
+        self.handle_victory(conquest_pct)
+        self.handle_game_over(owned_count, player.population, conquest_pct)
+
+    def handle_fail_spawn(
+        self, tick: int, owned_count: int, *, in_spawn_phase: bool
+    ) -> None:
         if (
-            not player.in_spawn_phase
-            and player.owned_count == 0
+            not in_spawn_phase
+            and owned_count == 0
             and self.previous_owned_count == 0
-            and player.tick > SPAWN_PHASE_DURATION + 50
+            and tick > SPAWN_PHASE_DURATION + 50
         ):
-            print(f"\nSpawn failed - never acquired any tiles (tick: {player.tick})")
+            print(f"\nSpawn failed - never acquired any tiles (tick: {tick})")
             raise RuntimeError("Spawn failed - ending game")
 
-    def handle_victory(self, player: PlayerState) -> None:
-        if player.conquest_percent >= CONQUEST_WIN_THRESHOLD:
+    def handle_victory(self, conquest_pct: int) -> None:
+        if conquest_pct >= CONQUEST_WIN_THRESHOLD:
             print(
-                f"\nVictory! Conquest: {player.conquest_percent}% (threshold: {CONQUEST_WIN_THRESHOLD}%)"
+                f"\nVictory! Conquest: {conquest_pct}% (threshold: {CONQUEST_WIN_THRESHOLD}%)"
             )
-            if self.metrics:
-                self.metrics.game_wins.append(1)
+            self.victory = True
             raise RuntimeError("Victory achieved - ending game")
 
     def handle_game_over(
@@ -249,35 +301,53 @@ class BotConnection(ConnectionHandler):
             )
             raise RuntimeError("Player eliminated - ending game")
 
+    def report_metrics(self) -> None:
+        assert self.metrics is not None
+        graph_path = self.metrics.generate_graphs(
+            alpha=self.agent.alpha,
+            gamma=self.agent.gamma,
+        )
+        if graph_path:
+            print(f"Graph saved to: {graph_path}")
+        summary = self.metrics.get_summary()
+        if summary:
+            print(
+                "Total games: "
+                f"{summary['total_games']}, "
+                f"Avg score: {summary['avg_score']:.2f}, "
+                f"Avg duration: {summary['avg_duration']:.1f} ticks, "
+                f"Win rate: {summary['win_rate'] * 100:.1f}%, "
+                f"Avg Q-table size: {summary['avg_qtable_size']:.0f}, "
+                f"Last epsilon: {summary['last_epsilon']:.4f}"
+            )
+
     async def on_agent_action(self) -> None:
         if self.metrics:
             self.metrics.add_reward(self.agent.reward)
 
-    async def autosave_loop(self):
-        try:
-            while self.running:
-                await asyncio.sleep(AUTOSAVE_INTERVAL)
-                await self.agent.save()
-        except asyncio.CancelledError:
-            pass
-
-    async def start_ping_loop(self, ws):
+    async def housekeeping_loop(self, ws) -> None:
+        loop = asyncio.get_running_loop()
+        autosave: asyncio.Task[None] | None = None
+        next_ping = loop.time() + PING_INTERVAL
+        next_save = loop.time() + AUTOSAVE_INTERVAL
         try:
             while self.running:
-                await asyncio.sleep(10)
-                ping_msg = {
-                    "type": "ping",
-                    "clientID": self.client_id,
-                    "gameID": self.current_game_id,
-                }
-                try:
-                    await self.send_intent(ws, ping_msg, "PING")
-                except ConnectionClosed:
-                    break
+                await asyncio.sleep(max(0.0, min(next_ping, next_save) - loop.time()))
+                now = loop.time()
+                if now >= next_ping:
+                    next_ping = now + PING_INTERVAL
+                    self._ping_msg["gameID"] = self.current_game_id
+                    self.send_intent(ws, self._ping_msg)
+                if now >= next_save:
+                    next_save = now + AUTOSAVE_INTERVAL
+                    # Saving can take a while on a large table; run it beside
+                    # the loop so pings keep going out on schedule.
+                    if autosave is None or autosave.done():
+                        autosave = asyncio.create_task(self.agent.save())
         except asyncio.CancelledError:
             pass
         except Exception as e:
-            print(f"Ping loop error: {e}")
+            print(f"Housekeeping loop error: {e}")
 
     async def run(self) -> None:
         backoff = 0.5
@@ -288,7 +358,10 @@ class BotConnection(ConnectionHandler):
                 self.current_game_id = None
                 self.has_spawned = False
                 self.previous_owned_count = 0
+                self.victory = False
+                self._last_tick_marker = None
                 self.running = True
+                self._outbox = asyncio.Queue()
 
                 print(f"\n=== Attempting to connect (Game #{self.game_count + 1}) ===")
                 print(
@@ -296,23 +369,26 @@ class BotConnection(ConnectionHandler):
                 )
 
                 try:
-                    async with websockets.connect(SERVER_WS) as ws:
+                    async with websockets.connect(
+                        SERVER_WS,
+                        compression=None,
+                        write_limit=WS_WRITE_LIMIT,
+                    ) as ws:
                         hello = {
                             "type": "hello",
                             "clientID": self.client_id,
                             "persistentID": self.persistent_id,
                             "username": self.username,
                         }
-                        await self.send_intent(ws, hello, "HELLO")
+                        self.send_intent(ws, hello)
 
                         self.game_count += 1
                         print(
                             f"Connected successfully! Game #{self.game_count} started"
                         )
-                        ping_task = asyncio.create_task(self.start_ping_loop(ws))
-                        autosave_task = asyncio.create_task(self.autosave_loop())
-
-                        await self.run_connection(ws, [autosave_task, ping_task])
+                        await self.run_connection(
+                            ws, [self.writer_loop(), self.housekeeping_loop(ws)]
+                        )
 
                 except Exception as e:
                     print("Connection error or game ended:", repr(e))
@@ -322,32 +398,25 @@ class BotConnection(ConnectionHandler):
                     await self.cleanup()
 
                     if self.metrics:
-                        player = PlayerState(self.env.current_state or {})
-                        qtable_size = await self.agent.qtable.get_size()
-
+                        if self._report_task is not None:
+                            await self._report_task
+                        # The previous render has finished, so the metrics
+                        # can be mutated again; the worker thread never sees
+                        # a series change under it.
+                        if self.victory:
+                            self.metrics.game_wins.append(1)
+                        player = self.env.current_player
                         self.metrics.end_game(
                             player.tick,
                             win=player.conquest_percent >= CONQUEST_WIN_THRESHOLD,
-                            qtable_size=qtable_size,
+                            qtable_size=self.agent.qtable.size,
                             epsilon=self.agent.epsilon,
                         )
-                        graph_path = self.metrics.generate_graphs(
-                            alpha=self.agent.alpha,
-                            gamma=self.agent.gamma,
+                        # Render in a worker thread so reconnecting does not
+                        # wait on matplotlib.
+                        self._report_task = asyncio.create_task(
+                            asyncio.to_thread(self.report_metrics)
                         )
-                        if graph_path:
-                            print(f"Graph saved to: {graph_path}")
-                        summary = self.metrics.get_summary()
-                        if summary:
-                            print(
-                                "Total games: "
-                                f"{summary['total_games']}, "
-                                f"Avg score: {summary['avg_score']:.2f}, "
-                                f"Avg duration: {summary['avg_duration']:.1f} ticks, "
-                                f"Win rate: {summary['win_rate'] * 100:.1f}%, "
-                                f"Avg Q-table size: {summary['avg_qtable_size']:.0f}, "
-                                f"Last epsilon: {summary['last_epsilon']:.4f}"
-                            )
 
                     print(f"Reconnecting in {backoff:.1f}s...")
                     await asyncio.sleep(backoff)
@@ -1,8 +1,14 @@
 import asyncio
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+from websockets import ConnectionClosedOK
 
 from lib.utils import Action
 
+if TYPE_CHECKING:
+    from lib.utils import AgentAction
+
 
 class ConnectionHandler(ABC):
     def __init__(self, agent, env):
@@ -26,10 +32,9 @@ class ConnectionHandler(ABC):
     async def action_sender_loop(self, ws):
         try:
             while self.running:
-                action = await self.env._action_queue.get()
-                if action.get("type") != Action.NONE.value:
+                action = await self.env.next_action()
+                if action.type != Action.NONE:
                     await self.send_action(ws, action)
-                self.env._action_queue.task_done()
         except asyncio.CancelledError:
             pass
         except Exception as e:
@@ -37,39 +42,42 @@ class ConnectionHandler(ABC):
 
     async def receive_loop(self, ws):
         try:
-            async for message in ws:
+            while True:
+                # Raw bytes go straight to orjson, which validates UTF-8
+                # itself, instead of being decoded to str first.
+                message = await ws.recv(decode=False)
                 await self.process_message(message)
+        except ConnectionClosedOK:
+            pass
         except Exception as e:
             print(f"Receive loop error: {e}")
         finally:
             self.running = False
 
-    async def run_connection(self, ws, additional_tasks=None):
-        receive_task = asyncio.create_task(self.receive_loop(ws))
-        sender_task = asyncio.create_task(self.action_sender_loop(ws))
-        agent_task = asyncio.create_task(self.agent_loop())
-
-        tasks = [receive_task, sender_task, agent_task]
-        if additional_tasks:
-            tasks.extend(additional_tasks)
+    async def run_connection(self, ws, background=()):
+        async with asyncio.TaskGroup() as tg:
+            receive_task = tg.create_task(self.receive_loop(ws))
+            tasks = [
+                tg.create_task(self.action_sender_loop(ws)),
+                tg.create_task(self.agent_loop()),
+                *(tg.create_task(coro) for coro in background),
+            ]
 
-        await receive_task
+            await receive_task
 
-        self.running = False
-        for task in tasks[1:]:
-            task.cancel()
-
-        await asyncio.gather(*tasks[1:], return_exceptions=True)
+            self.running = False
+            for task in tasks:
+                task.cancel()
 
     async def cleanup(self):
         await self.agent.save()
 
     @abstractmethod
-    async def send_action(self, ws, action: dict) -> None:
+    async def send_action(self, ws, action: AgentAction) -> None:
         pass
 
     @abstractmethod
-    async def process_message(self, message: str) -> None:
+    async def process_message(self, message: bytes) -> None:
         pass
 
     @abstractmethod
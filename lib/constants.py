@@ -11,8 +11,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+TRUTHY_VALUES = frozenset({"1", "true", "yes", "y", "on"})
+
+
 def as_bool(value: str) -> bool:
-    return value.strip().lower() in {"1", "true", "yes", "y", "on"}
+    return value.strip().lower() in TRUTHY_VALUES
 
 
 @lru_cache
@@ -72,6 +75,7 @@ INTERFACE_PORT = resolve_setting(
     caster=int,
 )
 QTABLE_FILE = resolve_setting("QTABLE_FILE", args.qtable_file, default="qtable.pkl")
+QTABLE_MAX_STATES = int(os.getenv("QTABLE_MAX_STATES", "100000"))
 
 AUTOSAVE_INTERVAL = resolve_setting(
     "AUTOSAVE_INTERVAL",
@@ -79,6 +83,15 @@ AUTOSAVE_INTERVAL = resolve_setting(
     default=300,
     caster=int,
 )
+PRINT_INTERVAL = max(
+    1,
+    resolve_setting(
+        "PRINT_INTERVAL",
+        args.print_interval,
+        default=10,
+        caster=int,
+    ),
+)
 GRAPH_ENABLED = resolve_setting(
     "GRAPH_ENABLED",
     args.graph,
@@ -110,6 +123,12 @@ REWARD_VICTORY = 1000000.0
 LOW_POPULATION_THRESHOLD = 0.40
 HIGH_POPULATION_THRESHOLD = 0.70
 SPAWN_PHASE_DURATION = 301
+PING_INTERVAL = 10
+
+# Websocket tuning: a larger write buffer lets bursts of outbound intents
+# go out without waiting on drain. Receive limits stay at the websockets
+# defaults so a slow consumer gets back-pressure instead of stale ticks.
+WS_WRITE_LIMIT = 2**20
 MAX_NEIGHBORS_DISPLAY = 5
 
 # Building costs
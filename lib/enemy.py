@@ -1,24 +1,19 @@
-from typing import Any
+from typing import Any, NamedTuple
 
 
-class Enemy:
+class Enemy(NamedTuple):
     """Represents an enemy tile that can be attacked or interacted with."""
 
-    def __init__(self, data: dict[str, Any]):
-        self._data = data
+    troops: int
+    x: int
+    y: int
+    owner_player_id: str | None
 
-    @property
-    def troops(self) -> int:
-        return self._data.get("troops", 0)
-
-    @property
-    def x(self) -> int:
-        return self._data.get("x", 0)
-
-    @property
-    def y(self) -> int:
-        return self._data.get("y", 0)
-
-    @property
-    def owner_player_id(self) -> str | None:
-        return self._data.get("ownerPlayerID")
+    @classmethod
+    def from_candidate(cls, data: dict[str, Any]) -> Enemy:
+        return cls(
+            data.get("troops", 0),
+            data.get("x", 0),
+            data.get("y", 0),
+            data.get("ownerPlayerID"),
+        )
@@ -1,29 +1,36 @@
 from __future__ import annotations
 
+from array import array
+from itertools import accumulate
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-
 if TYPE_CHECKING:
+    from collections.abc import Sequence
     from typing import Any
 
-mpl.use("Agg")
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+    from matplotlib.lines import Line2D
 
 GAME_NUMBER_LABEL = "Game Number"
 
 
 class GameMetrics:
     def __init__(self) -> None:
-        self.game_scores: list[float] = []
-        self.game_durations: list[int] = []
-        self.game_wins: list[int] = []
-        self.qtable_sizes: list[int] = []
-        self.epsilons: list[float] = []
+        # Typed arrays keep per-game history unboxed over long training runs.
+        self.game_scores: array[float] = array("d")
+        self.game_durations: array[int] = array("q")
+        self.game_wins: array[int] = array("b")
+        self.qtable_sizes: array[int] = array("q")
+        self.epsilons: array[float] = array("d")
 
         self.current_game_start_tick: int | None = None
         self.current_game_score: float = 0.0
+        self._figure: Figure | None = None
+        self._axes: Any = None
+        self._ax_eps: Axes | None = None
+        self._lines: dict[str, Line2D] = {}
 
     def start_game(self) -> None:
         self.current_game_start_tick = None
@@ -55,63 +62,31 @@ class GameMetrics:
         self.qtable_sizes.append(qtable_size if qtable_size is not None else 0)
         self.epsilons.append(epsilon if epsilon is not None else 0.0)
 
-    def generate_graphs(
-        self,
-        output_dir: str = ".",
-        filename: str = "metrics.png",
-        alpha: float | None = None,
-        gamma: float | None = None,
-    ) -> str:
-        if not self.game_scores:
-            return ""
-
-        output_path = Path(output_dir) / filename
+    def _build_figure(self, alpha: float | None, gamma: float | None) -> None:
+        # matplotlib is heavy to import and only needed once graphs are drawn.
+        from matplotlib.figure import Figure  # noqa: PLC0415
 
-        fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+        fig = Figure(figsize=(14, 10))
+        axes = fig.subplots(2, 2)
         fig.suptitle("AI Learning Progress", fontsize=16, fontweight="bold")
 
-        game_numbers = list(range(1, len(self.game_scores) + 1))
-
-        def moving_average(values: list[float], window: int = 5) -> list[float]:
-            if not values:
-                return []
-            smoothed: list[float] = []
-            for i in range(len(values)):
-                start = max(0, i - window + 1)
-                window_slice = values[start : i + 1]
-                smoothed.append(sum(window_slice) / len(window_slice))
-            return smoothed
-
         # Plot 1: Total Reward per Game + moving average
-        axes[0, 0].plot(game_numbers, self.game_scores, marker="o", linewidth=2)
+        (score_line,) = axes[0, 0].plot([], [], marker="o", linewidth=2)
+        (smoothed_line,) = axes[0, 0].plot(
+            [],
+            [],
+            color="r",
+            linestyle="--",
+            label="Moving Avg (w=5)",
+            linewidth=2,
+        )
         axes[0, 0].set_title("Total Reward per Game")
         axes[0, 0].set_xlabel(GAME_NUMBER_LABEL)
         axes[0, 0].set_ylabel("Total Reward")
         axes[0, 0].grid(visible=True, alpha=0.3)
-        if len(self.game_scores) > 1:
-            smoothed_scores = moving_average(self.game_scores, window=5)
-            axes[0, 0].plot(
-                game_numbers,
-                smoothed_scores,
-                color="r",
-                linestyle="--",
-                label="Moving Avg (w=5)",
-                linewidth=2,
-            )
-            axes[0, 0].legend()
 
         # Plot 2: Win rate (cumulative)
-        if self.game_wins:
-            cumulative_win_rate = [
-                sum(self.game_wins[: i + 1]) / (i + 1) for i in range(len(game_numbers))
-            ]
-            axes[0, 1].plot(
-                game_numbers,
-                cumulative_win_rate,
-                marker="s",
-                color="green",
-                linewidth=2,
-            )
+        (win_line,) = axes[0, 1].plot([], [], marker="s", color="green", linewidth=2)
         axes[0, 1].set_ylim(0, 1)
         axes[0, 1].set_title("Win Rate (cumulative)")
         axes[0, 1].set_xlabel(GAME_NUMBER_LABEL)
@@ -119,8 +94,8 @@ class GameMetrics:
         axes[0, 1].grid(visible=True, alpha=0.3)
 
         # Plot 3: Game Duration (ticks)
-        axes[1, 0].plot(
-            game_numbers, self.game_durations, marker="s", color="green", linewidth=2
+        (duration_line,) = axes[1, 0].plot(
+            [], [], marker="s", color="green", linewidth=2
         )
         axes[1, 0].set_title("Game Duration (ticks)")
         axes[1, 0].set_xlabel(GAME_NUMBER_LABEL)
@@ -128,15 +103,9 @@ class GameMetrics:
         axes[1, 0].grid(visible=True, alpha=0.3)
 
         # Plot 4: Q-table size per game (with epsilon on twin axis)
-        if self.qtable_sizes:
-            axes[1, 1].plot(
-                game_numbers,
-                self.qtable_sizes,
-                marker="^",
-                color="purple",
-                linewidth=2,
-                label="Q-table size",
-            )
+        (qtable_line,) = axes[1, 1].plot(
+            [], [], marker="^", color="purple", linewidth=2, label="Q-table size"
+        )
         axes[1, 1].set_title("Q-table Size & Epsilon per Game")
         axes[1, 1].set_xlabel(GAME_NUMBER_LABEL)
         axes[1, 1].set_ylabel("States", color="purple")
@@ -144,20 +113,12 @@ class GameMetrics:
         axes[1, 1].grid(visible=True, alpha=0.3)
 
         ax_eps = axes[1, 1].twinx()
-        if self.epsilons:
-            ax_eps.plot(
-                game_numbers,
-                self.epsilons,
-                marker="d",
-                color="orange",
-                linewidth=2,
-                label="Epsilon",
-            )
+        (epsilon_line,) = ax_eps.plot(
+            [], [], marker="d", color="orange", linewidth=2, label="Epsilon"
+        )
         ax_eps.set_ylabel("Epsilon", color="orange")
         ax_eps.tick_params(axis="y", labelcolor="orange")
 
-        plt.tight_layout()
-
         if alpha is not None or gamma is not None:
             params_text = "Training Parameters:\n"
             if alpha is not None:
@@ -176,8 +137,76 @@ class GameMetrics:
                 transform=fig.transFigure,
             )
 
-        plt.savefig(output_path, dpi=100, bbox_inches="tight")
-        plt.close(fig)
+        self._figure = fig
+        self._axes = axes
+        self._ax_eps = ax_eps
+        self._lines = {
+            "score": score_line,
+            "smoothed": smoothed_line,
+            "win": win_line,
+            "duration": duration_line,
+            "qtable": qtable_line,
+            "epsilon": epsilon_line,
+        }
+
+    def generate_graphs(
+        self,
+        output_dir: str = ".",
+        filename: str = "metrics.png",
+        alpha: float | None = None,
+        gamma: float | None = None,
+    ) -> str:
+        if not self.game_scores:
+            return ""
+
+        # The figure is laid out once; later games only replace line data.
+        if self._figure is None:
+            self._build_figure(alpha, gamma)
+        assert self._figure is not None
+        assert self._ax_eps is not None
+        axes = self._axes
+        lines = self._lines
+
+        output_path = Path(output_dir) / filename
+        game_numbers = list(range(1, len(self.game_scores) + 1))
+
+        def moving_average(values: Sequence[float], window: int = 5) -> list[float]:
+            # Prefix sums make each window an O(1) difference.
+            prefix = list(accumulate(values, initial=0.0))
+            return [
+                (prefix[i + 1] - prefix[max(0, i - window + 1)]) / min(i + 1, window)
+                for i in range(len(values))
+            ]
+
+        lines["score"].set_data(game_numbers, self.game_scores)
+        if len(self.game_scores) > 1:
+            smoothed_scores = moving_average(self.game_scores, window=5)
+            lines["smoothed"].set_data(game_numbers, smoothed_scores)
+            axes[0, 0].legend()
+
+        if self.game_wins:
+            wins_so_far = list(accumulate(self.game_wins))
+            last = len(wins_so_far) - 1
+            cumulative_win_rate = [
+                wins_so_far[min(i, last)] / (i + 1) for i in range(len(game_numbers))
+            ]
+            lines["win"].set_data(game_numbers, cumulative_win_rate)
+
+        lines["duration"].set_data(game_numbers, self.game_durations)
+        if self.qtable_sizes:
+            lines["qtable"].set_data(game_numbers, self.qtable_sizes)
+        if self.epsilons:
+            lines["epsilon"].set_data(game_numbers, self.epsilons)
+
+        for ax in (*axes.flat, self._ax_eps):
+            ax.relim()
+            ax.autoscale_view()
+        # Cumulative win rate keeps its fixed 0..1 range.
+        axes[0, 1].set_ylim(0, 1)
+
+        # Tick labels widen as data grows, so spacing is recomputed per render.
+        self._figure.tight_layout()
+        self._figure.savefig(output_path, dpi=100, bbox_inches="tight")
 
         return str(output_path)
 
@@ -1,12 +1,24 @@
-from typing import Any
+from functools import cached_property
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
 
 from lib.enemy import Enemy
 
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+# Shared read-only fallback for missing sections, so absent keys do not
+# allocate a fresh dict on every access.
+EMPTY: Mapping[str, Any] = MappingProxyType({})
+
 
 class PlayerState:
+    # __dict__ stays available for the cached properties below.
+    __slots__ = ("__dict__", "_me", "_state")
+
     def __init__(self, state: dict[str, Any]):
         self._state = state
-        self._me = state.get("me", {})
+        self._me: Mapping[str, Any] = state.get("me") or EMPTY
 
     @property
     def gold(self) -> int:
@@ -28,9 +40,9 @@ class PlayerState:
     def owned_count(self) -> int:
         return self._me.get("ownedCount", 0)
 
-    @property
-    def buildings(self) -> dict:
-        return self._me.get("buildings", {})
+    @cached_property
+    def buildings(self) -> Mapping[str, Any]:
+        return self._me.get("buildings") or EMPTY
 
     @property
     def city_count(self) -> int:
@@ -54,22 +66,24 @@ class PlayerState:
     def tick(self) -> int:
         return self._state.get("tick", 0)
 
-    @property
+    @cached_property
     def enemies(self) -> list[Enemy]:
-        candidates_data = self._state.get("candidates") or []
-        return [Enemy(c) for c in candidates_data]
+        candidates_data = self._state.get("candidates") or ()
+        return [Enemy.from_candidate(c) for c in candidates_data]
 
-    @property
-    def players(self) -> list:
-        return self._state.get("players", [])
+    @cached_property
+    def players(self) -> Sequence[dict[str, Any]]:
+        return self._state.get("players") or ()
 
-    @property
+    @cached_property
+    def player_ids(self) -> dict[int, str]:
+        return {
+            player.get("smallID"): player.get("playerID") for player in self.players
+        }
+
+    @cached_property
     def player_id(self) -> str | None:
         if self.small_id is None or self.small_id < 0:
             return None
 
-        for player in self.players:
-            if player.get("smallID") == self.small_id:
-                return player.get("playerID")
-
-        return None
+        return self.player_ids.get(self.small_id)
@@ -1,12 +1,20 @@
 import asyncio
 import contextlib
 import fcntl
+import os
 import pickle
+import random
+import sys
 import threading
+from collections import OrderedDict
+from operator import itemgetter
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from lib.constants import QTABLE_FILE
+from lib.constants import QTABLE_FILE, QTABLE_MAX_STATES
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
 
 _initialization_lock = threading.Lock()
 
@@ -17,10 +25,20 @@ class QTable:
     _instance: QTable | None = None
     _lock: asyncio.Lock | None = None
 
-    def __init__(self, filename: str = QTABLE_FILE):
+    def __init__(
+        self, filename: str = QTABLE_FILE, max_states: int = QTABLE_MAX_STATES
+    ):
         self.filename = Path(filename)
-        self._local_qtable: dict[Any, dict[str, float]] = {}
+        self.max_states = max_states
+        # Ordered by last update so the least recently visited states are
+        # evicted first once max_states is exceeded.
+        self._local_qtable: OrderedDict[Any, dict[str, float]] = OrderedDict()
+        self._best: dict[Any, tuple[str, float]] = {}
         self._dirty = False
+        self._save_task: asyncio.Task[None] | None = None
+        # mtime of the file as of our last load or save; an unchanged mtime
+        # means no other bot has written since and the merge can be skipped.
+        self._last_mtime_ns: int | None = None
 
     @classmethod
     def get_instance(cls, filename: str = QTABLE_FILE) -> QTable:
@@ -42,7 +60,9 @@ class QTable:
 
     def _acquire_file_lock(self, file_handle) -> None:
         try:
-            fcntl.flock(file_handle.fileno(), fcntl.LOCK_EX)
+            # Writers publish through an atomic rename and never lock, so
+            # readers only need a shared lock and can overlap each other.
+            fcntl.flock(file_handle.fileno(), fcntl.LOCK_SH)
         except (OSError, AttributeError) as e:
             print(f"Warning: Could not acquire file lock: {e}")
 
@@ -53,7 +73,8 @@ class QTable:
     async def load(self) -> None:
         if not self.filename.exists():
             print(f"No saved Q-table found at {self.filename}, starting fresh")
-            self._local_qtable = {}
+            self._local_qtable = OrderedDict()
+            self._best = {}
             return
 
         async with await self.get_lock():
@@ -62,7 +83,16 @@ class QTable:
                     self._acquire_file_lock(f)
                     try:
                         data = pickle.load(f)
-                        self._local_qtable = data
+                        self._last_mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+                        self._local_qtable = OrderedDict(
+                            (
+                                state_key,
+                                {sys.intern(k): q for k, q in actions.items()},
+                            )
+                            for state_key, actions in data.items()
+                        )
+                        self._evict()
+                        self._rebuild_best()
                         print(
                             f"Q-table loaded from {self.filename} "
                             f"({len(self._local_qtable)} states)"
@@ -72,78 +102,160 @@ class QTable:
                         self._release_file_lock(f)
             except Exception as e:
                 print(f"Error loading Q-table: {e}, starting fresh")
-                self._local_qtable = {}
+                self._local_qtable = OrderedDict()
+                self._best = {}
+
+    def _evict(self) -> None:
+        while len(self._local_qtable) > self.max_states:
+            state_key, _ = self._local_qtable.popitem(last=False)
+            self._best.pop(state_key, None)
+
+    def _rebuild_best(self) -> None:
+        self._best = {
+            state_key: max(actions.items(), key=itemgetter(1))
+            for state_key, actions in self._local_qtable.items()
+            if actions
+        }
+
+    def _update_best(self, state_key: Any, action_key: str, q_value: float) -> None:
+        best = self._best.get(state_key)
+        if best is None or q_value > best[1]:
+            self._best[state_key] = (action_key, q_value)
+        elif best[0] == action_key:
+            if q_value == best[1]:
+                return
+            self._best[state_key] = max(
+                self._local_qtable[state_key].items(), key=itemgetter(1)
+            )
 
     def _merge_qtable(self, other_qtable: dict[Any, dict[str, float]]) -> None:
+        local = self._local_qtable
         for state_key, actions in other_qtable.items():
-            if state_key not in self._local_qtable:
-                self._local_qtable[state_key] = {}
+            row = local.get(state_key)
+            if row is None:
+                # States only seen on disk count as least recently used, so
+                # eviction drops them before this bot's own states.
+                row = local[state_key] = {}
+                local.move_to_end(state_key, last=False)
             for action_key, q_value in actions.items():
-                current_value = self._local_qtable[state_key].get(action_key, 0.0)
-                self._local_qtable[state_key][action_key] = max(current_value, q_value)
+                current_value = row.get(action_key, 0.0)
+                row[action_key] = q_value if q_value > current_value else current_value
 
-    def _load_and_merge(self) -> None:
-        if not self.filename.exists():
-            return
+    def _read_saved(self) -> dict[Any, dict[str, float]] | None:
+        try:
+            if self.filename.stat().st_mtime_ns == self._last_mtime_ns:
+                return None
+        except FileNotFoundError:
+            return None
 
         with self.filename.open("rb") as f:
             self._acquire_file_lock(f)
             try:
-                try:
-                    data = pickle.load(f)
-                    other_qtable = data[0] if isinstance(data, tuple) else data
-                    self._merge_qtable(other_qtable)
-                except Exception:
-                    pass
+                data = pickle.load(f)
+            except Exception:
+                return None
             finally:
                 self._release_file_lock(f)
+        return data[0] if isinstance(data, tuple) else data
 
-    async def save(self) -> None:
-        if len(self._local_qtable) == 0 and not self._dirty:
-            return
+    def _dump(self, snapshot: dict[Any, dict[str, float]]) -> None:
+        # Write to a private temp file and rename it over the target, so
+        # readers only ever see a complete table and no write lock is needed.
+        tmp_path = self.filename.with_name(f"{self.filename.name}.{os.getpid()}.tmp")
+        try:
+            with tmp_path.open("wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Take the mtime before the rename so a write by another bot
+            # that lands right after it is not mistaken for our own.
+            mtime_ns = tmp_path.stat().st_mtime_ns
+            tmp_path.replace(self.filename)
+            self._last_mtime_ns = mtime_ns
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
 
+    async def _save(self) -> None:
+        # The lock only serializes saves and loads. File I/O runs in a worker
+        # thread, while the merge and snapshot happen on the event loop so
+        # the synchronous Q-value accessors never race with the writer.
         async with await self.get_lock():
             try:
-                self._load_and_merge()
-
-                with self.filename.open("wb") as f:
-                    self._acquire_file_lock(f)
-                    try:
-                        pickle.dump(self._local_qtable, f)
-                        print(
-                            f"Q-table saved to {self.filename} "
-                            f"({len(self._local_qtable)} states)"
-                        )
-                        self._dirty = False
-                    finally:
-                        self._release_file_lock(f)
+                other_qtable = await asyncio.to_thread(self._read_saved)
+                if other_qtable:
+                    self._merge_qtable(other_qtable)
+                    self._evict()
+                    self._rebuild_best()
+                snapshot = {k: dict(v) for k, v in self._local_qtable.items()}
+                self._dirty = False
+                await asyncio.to_thread(self._dump, snapshot)
+                print(f"Q-table saved to {self.filename} ({len(snapshot)} states)")
             except Exception as e:
+                self._dirty = True
                 print(f"Error saving Q-table: {e}")
 
-    async def get_q_value(self, state_key: Any, action_key: str) -> float:
-        async with await self.get_lock():
-            if state_key not in self._local_qtable:
-                return 0.0
-            return self._local_qtable[state_key].get(action_key, 0.0)
+    async def save(self) -> None:
+        if len(self._local_qtable) == 0 and not self._dirty:
+            return
 
-    async def set_q_value(
-        self, state_key: Any, action_key: str, q_value: float
-    ) -> None:
-        async with await self.get_lock():
-            if state_key not in self._local_qtable:
-                self._local_qtable[state_key] = {}
-            self._local_qtable[state_key][action_key] = q_value
-            self._dirty = True
+        # A save that is already running took its snapshot before this call,
+        # so join it and chain one follow-up only if values changed since.
+        # Shielding keeps the write going if the caller is cancelled.
+        running = self._save_task
+        if running is not None and not running.done():
+            await asyncio.shield(running)
+            if not self._dirty:
+                return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save())
+        await asyncio.shield(self._save_task)
 
-    async def get_max_q_value(self, state_key: Any) -> float:
-        async with await self.get_lock():
-            if state_key not in self._local_qtable or not self._local_qtable[state_key]:
-                return 0.0
-            return max(self._local_qtable[state_key].values())
+    def get_q_value(self, state_key: Any, action_key: str) -> float:
+        row = self._local_qtable.get(state_key)
+        return row.get(action_key, 0.0) if row is not None else 0.0
 
-    async def get_size(self) -> int:
-        try:
-            async with await self.get_lock():
-                return len(self._local_qtable)
-        except Exception:
-            return 0
+    def set_q_value(self, state_key: Any, action_key: str, q_value: float) -> None:
+        local = self._local_qtable
+        row = local.get(state_key)
+        if row is None:
+            row = local[state_key] = {}
+            self._evict()
+        else:
+            local.move_to_end(state_key)
+        row[action_key] = q_value
+        self._update_best(state_key, action_key, q_value)
+        self._dirty = True
+
+    def update(
+        self,
+        state_key: Any,
+        action_key: str,
+        next_state_key: Any,
+        rule: Callable[[float, float], float],
+    ) -> float:
+        """Apply ``rule(current_q, max_next_q)`` to one Q-value."""
+        new_q = rule(
+            self.get_q_value(state_key, action_key),
+            self.get_max_q_value(next_state_key),
+        )
+        self.set_q_value(state_key, action_key, new_q)
+        return new_q
+
+    def get_max_q_value(self, state_key: Any) -> float:
+        best = self._best.get(state_key)
+        return best[1] if best is not None else 0.0
+
+    def get_best_action(self, state_key: Any, action_keys: Sequence[str]) -> int | None:
+        row = self._local_qtable.get(state_key)
+        if not row:
+            return None
+        values = [row.get(k, 0.0) for k in action_keys]
+        best = max(values)
+        # Untried actions score 0.0 like any tied value; picking among ties
+        # at random keeps the greedy choice from always landing on index 0.
+        return random.choice([i for i, q in enumerate(values) if q == best])
+
+    @property
+    def size(self) -> int:
+        # len() is atomic, so reporting the size never waits behind an update
+        # or an in-flight save.
+        return len(self._local_qtable)
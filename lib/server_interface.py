@@ -1,22 +1,25 @@
-import json
 from typing import TYPE_CHECKING
 
+import orjson
+
 from lib.connection_handler import ConnectionHandler
 
 if TYPE_CHECKING:
     from websockets.asyncio.server import ServerConnection
 
+    from lib.utils import AgentAction
+
 
 class ServerInterface(ConnectionHandler):
     def __init__(self, agent, env):
         super().__init__(agent, env)
 
-    async def send_action(self, ws, action: dict) -> None:
-        await ws.send(json.dumps(action))
+    async def send_action(self, ws, action: AgentAction) -> None:
+        await ws.send(orjson.dumps(action.to_dict()), text=True)
 
-    async def process_message(self, message: str) -> None:
+    async def process_message(self, message: bytes) -> None:
         try:
-            state = json.loads(message)
+            state = orjson.loads(message)
         except Exception:
             return
 
@@ -31,7 +34,7 @@ class ServerInterface(ConnectionHandler):
     async def handle_connection(self, ws: ServerConnection) -> None:
         hello = await ws.recv()
         try:
-            msg = json.loads(hello)
+            msg = orjson.loads(hello)
             print("Bot connected:", msg)
         except Exception:
             print("Bot connected; failed reading hello message")
@@ -1,5 +1,7 @@
-from enum import Enum
-from typing import TYPE_CHECKING, Any
+import sys
+from enum import StrEnum
+from functools import cache
+from typing import TYPE_CHECKING, Any, NamedTuple
 
 from lib.constants import CITY_BASE_COST, CITY_MAX_COST
 
@@ -7,45 +9,79 @@ if TYPE_CHECKING:
     from lib.player_state import PlayerState
 
 
-class Action(Enum):
+class Action(StrEnum):
     SPAWN = "spawn"
     ATTACK = "attack"
     BUILD = "build_unit"
     NONE = "none"
 
 
-class BuildingType(Enum):
+class BuildingType(StrEnum):
     CITY = "City"
 
 
-def get_action_key(action: dict[str, Any], player: PlayerState, ratio_fn) -> str:
-    action_type = action.get("type")
+class AgentAction(NamedTuple):
+    type: Action
+    neighbor_index: int | None = None
+    x: int | None = None
+    y: int | None = None
+    ratio: float | None = None
+    unit: str | None = None
 
-    if action_type == Action.SPAWN.value:
-        return Action.SPAWN.value
+    def to_dict(self) -> dict[str, Any]:
+        return {k: v for k, v in self._asdict().items() if v is not None}
 
-    if action_type == Action.BUILD.value:
-        return f"build:{action.get('unit')}"
 
-    if action_type == Action.ATTACK.value:
-        neighbor_idx = action.get("neighbor_index")
-        troop_ratio = action.get("ratio")
+# Q-table action keys are stored as plain strings rather than enum members.
+NONE_KEY = Action.NONE.value
+SPAWN_KEY = Action.SPAWN.value
+
+NONE_ACTION = AgentAction(Action.NONE)
+SPAWN_ACTION = AgentAction(Action.SPAWN, x=-1, y=-1)
+BUILD_CITY_ACTION = AgentAction(Action.BUILD, unit=BuildingType.CITY)
+
+
+# Keys are interned so Q-table rows created from them compare by identity
+# on later lookups instead of falling back to a string comparison.
+@cache
+def build_key(unit: str | None) -> str:
+    return sys.intern(f"build:{unit}")
+
+
+@cache
+def attack_key(strength_ratio: int, troop_ratio: float | None) -> str:
+    return sys.intern(f"attack:{strength_ratio}|{troop_ratio}")
+
+
+def get_action_key(action: AgentAction, player: PlayerState, ratio_fn) -> str:
+    action_type = action.type
+
+    if action_type == Action.SPAWN:
+        return SPAWN_KEY
+
+    if action_type == Action.BUILD:
+        return build_key(action.unit)
+
+    if action_type == Action.ATTACK:
+        neighbor_idx = action.neighbor_index
+        troop_ratio = action.ratio
 
         if (
             neighbor_idx is None
             or not isinstance(neighbor_idx, int)
             or neighbor_idx >= len(player.enemies)
         ):
-            return Action.NONE.value
+            return NONE_KEY
 
         strength_ratio = ratio_fn(
             player.population, player.enemies[neighbor_idx].troops
         )
-        return f"attack:{strength_ratio}|{troop_ratio}"
+        return attack_key(strength_ratio, troop_ratio)
 
-    return Action.NONE.value
+    return NONE_KEY
 
 
+@cache
 def calculate_building_cost(building_type: BuildingType, current_count: int) -> int:
     if building_type == BuildingType.CITY:
         return min(CITY_MAX_COST, 2**current_count * CITY_BASE_COST)
@@ -10,6 +10,7 @@ from lib.bot_connection import BotConnection
 from lib.constants import (
     ALPHA,
     CONQUEST_WIN_THRESHOLD,
+    DEBUG_MODE,
     EPSILON,
     GAMMA,
     HIGH_POPULATION_THRESHOLD,
@@ -19,6 +20,7 @@ from lib.constants import (
     MAX_NEIGHBORS_DISPLAY,
     MODE,
     PRECISION,
+    PRINT_INTERVAL,
     REWARD_ATTACK_AT_LOW_POPULATION,
     REWARD_CONQUEST_GAIN,
     REWARD_CONQUEST_LOSS,
@@ -29,17 +31,30 @@ from lib.constants import (
     REWARD_VERY_HIGH_POPULATION,
     REWARD_VERY_LOW_POPULATION,
     REWARD_VICTORY,
+    WS_WRITE_LIMIT,
 )
 from lib.player_state import PlayerState
 from lib.qtable import QTable
 from lib.server_interface import ServerInterface
 from lib.utils import (
+    BUILD_CITY_ACTION,
+    NONE_ACTION,
+    NONE_KEY,
+    SPAWN_ACTION,
     Action,
+    AgentAction,
     BuildingType,
     calculate_building_cost,
     get_action_key,
 )
 
+try:
+    import uvloop
+
+    loop_factory = uvloop.new_event_loop
+except ImportError:
+    loop_factory = None
+
 
 def calculate_neighbor_ratio(my_troops: int, enemy_troops: int) -> int:
     if enemy_troops == 0:
@@ -52,32 +67,41 @@ def calculate_neighbor_ratio(my_troops: int, enemy_troops: int) -> int:
     return int(max(-PRECISION, min(PRECISION, round(scaled_value))))
 
 
-def arg_max(table):
-    return max(table, key=table.get)
-
-
 class Environment:
     def __init__(self):
         self.current_state: dict[str, Any] | None = None
         self.previous_state: dict[str, Any] | None = None
+        self.current_player = PlayerState({})
+        self.previous_player = PlayerState({})
         self._state_event = asyncio.Event()
-        self._action_queue = asyncio.Queue()
+        # At most one action is in flight: the agent waits for the next state
+        # before choosing another, so a single slot replaces a queue.
+        self._pending_action: AgentAction | None = None
+        self._action_ready = asyncio.Event()
 
     def update_state(self, state: dict[str, Any]) -> None:
         self.previous_state = self.current_state
         self.current_state = state
+        self.previous_player = self.current_player
+        self.current_player = PlayerState(state)
         self._state_event.set()
 
+    async def next_action(self) -> AgentAction | None:
+        await self._action_ready.wait()
+        self._action_ready.clear()
+        return self._pending_action
+
     async def do(self, action):
-        await self._action_queue.put(action)
+        self._pending_action = action
+        self._action_ready.set()
 
         self._state_event.clear()
         await self._state_event.wait()
 
-        action_type = action.get("type") if action else None
-        old_player = PlayerState(self.previous_state or {})
-        new_player = PlayerState(self.current_state or {})
-        reward = self.calculate_reward(old_player, new_player, action_type)
+        action_type = action.type if action else None
+        reward = self.calculate_reward(
+            self.previous_player, self.current_player, action_type
+        )
 
         return self.current_state, reward
 
@@ -108,7 +132,7 @@ class Environment:
         self, player: PlayerState, action: str | None
     ) -> float:
         if (
-            action == Action.ATTACK.value
+            action == Action.ATTACK
             and player.population_ratio < LOW_POPULATION_THRESHOLD
         ):
             return REWARD_ATTACK_AT_LOW_POPULATION
@@ -119,12 +143,14 @@ class Environment:
     ) -> float:
         reward = 0.0
 
-        if action == Action.SPAWN.value:
+        if action == Action.SPAWN:
             reward += REWARD_SPAWN_SUCCESS
 
-        prev_empty = [e for e in old.enemies if e.troops == 0]
-
-        if old.in_spawn_phase and len(prev_empty) > 0 and new.population == 0:
+        if (
+            old.in_spawn_phase
+            and new.population == 0
+            and any(e.troops == 0 for e in old.enemies)
+        ):
             reward += REWARD_SPAWN_FAILED
 
         return reward
@@ -139,10 +165,10 @@ class Environment:
             LEARNING_ASSISTANCE == "low"
             and action is not None
             and (
-                (action == Action.SPAWN.value and not old.in_spawn_phase)
-                or (action == Action.ATTACK.value and old.population == 0)
+                (action == Action.SPAWN and not old.in_spawn_phase)
+                or (action == Action.ATTACK and old.population == 0)
                 or (
-                    action == Action.BUILD.value
+                    action == Action.BUILD
                     and old.gold
                     < calculate_building_cost(BuildingType.CITY, old.city_count)
                 )
@@ -170,6 +196,9 @@ class Agent:
         self.epsilon = EPSILON
         self.history = []
         self.total_reward = 0
+        self.action_key: str | None = None
+        self._state_source: PlayerState | None = None
+        self._state_key: tuple | None = None
         self.reset()
 
     def reset(self):
@@ -177,6 +206,7 @@ class Agent:
             self.history.append(self.total_reward)
         self.score = 0
         self.total_reward = 0
+        self.steps = 0
         self.state = None
         self.random_actions = 0
         self.qtable_actions = 0
@@ -184,8 +214,9 @@ class Agent:
         self.attack_actions = 0
 
     def get_state(self):
-        s = getattr(self.env, "current_state", {}) or {}
-        player = PlayerState(s)
+        player = self.env.current_player
+        if player is self._state_source:
+            return self._state_key
 
         step_size = 10 / PRECISION
         conquest_pct = int(round(player.conquest_percent / step_size) * step_size)
@@ -197,20 +228,28 @@ class Agent:
             else 0
         )
 
-        neighbor_ratios = []
-        for enemy in player.enemies:
-            ratio = calculate_neighbor_ratio(player.population, enemy.troops)
-            neighbor_ratios.append(ratio)
+        population = player.population
+        neighbor_ratios = tuple(
+            calculate_neighbor_ratio(population, enemy.troops)
+            for enemy in player.enemies
+        )
 
         city_cost = calculate_building_cost(BuildingType.CITY, player.city_count)
         can_afford_city = int(player.gold >= city_cost)
 
-        return (
+        self._state_source = player
+        self._state_key = (
             player.in_spawn_phase,
             population_pct,
             conquest_pct,
             can_afford_city,
-            tuple(neighbor_ratios),
+            neighbor_ratios,
+        )
+        return self._state_key
+
+    def q_learning_rule(self, current_q: float, max_next_q: float) -> float:
+        return current_q + self.alpha * (
+            self.reward + self.gamma * max_next_q - current_q
         )
 
     async def do(self, action):
@@ -219,21 +258,24 @@ class Agent:
         new_state_key = self.get_state()
         prev_state_key = previous_state
 
-        player = PlayerState(self.env.current_state or {})
-        action_key = get_action_key(action, player, calculate_neighbor_ratio)
+        player = self.env.current_player
+        action_key = self.action_key or NONE_KEY
 
-        current_q = await self.qtable.get_q_value(prev_state_key, action_key)
-        max_next_q = await self.qtable.get_max_q_value(new_state_key)
-        delta = self.alpha * (self.reward + self.gamma * max_next_q - current_q)
-        new_q = current_q + delta
-        await self.qtable.set_q_value(prev_state_key, action_key, new_q)
+        self.qtable.update(
+            prev_state_key, action_key, new_state_key, self.q_learning_rule
+        )
 
         self.score += self.reward
         self.total_reward += self.reward
+        self.steps += 1
 
-        in_spawn, pop_pct, conquest_state, can_afford_city, neighbor_ratios = (
-            new_state_key
-        )
+        if DEBUG_MODE or self.steps % PRINT_INTERVAL == 0:
+            self.print_status(player, new_state_key)
+
+        self.state = new_state_key
+
+    def print_status(self, player: PlayerState, state_key: tuple) -> None:
+        in_spawn, pop_pct, conquest_state, can_afford_city, neighbor_ratios = state_key
         neighbors_str = ",".join(
             str(n) for n in neighbor_ratios[:MAX_NEIGHBORS_DISPLAY]
         )
@@ -243,53 +285,33 @@ class Agent:
         status = f"\rTick: {player.tick:4d} | Pop: {player.population:7d}/{player.max_population:7d} | Conquest: {player.conquest_percent:2d}% | Gold: {player.gold:6d} | Cities: {player.city_count} | Reward: {self.reward:7.1f} | Total: {self.total_reward:8.1f} | R:{self.random_actions}/Q:{self.qtable_actions} | W:{self.wait_actions}/A:{self.attack_actions} | {state_str}"
         print(status + " " * 20, end="", flush=True)
 
-        self.state = new_state_key
-
-    async def best_action(self):
+    def best_action(self, action_keys: list[str]) -> int | None:
         self.state = self.get_state()
+        return self.qtable.get_best_action(self.state, action_keys)
 
-        async with await self.qtable.get_lock():
-            if self.qtable._local_qtable.get(self.state):
-                return arg_max(self.qtable._local_qtable[self.state])
-        return None
-
-    def get_possible_actions(self):
-        player = PlayerState(self.env.current_state or {})
-        possible_actions = [{"type": Action.NONE.value}]
+    def get_possible_actions(self) -> list[AgentAction]:
+        player = self.env.current_player
+        possible_actions = [NONE_ACTION]
 
-        SPAWN_REQUEST = {"type": Action.SPAWN.value, "x": -1, "y": -1}
         match LEARNING_ASSISTANCE:
             case "low":
-                possible_actions.append(SPAWN_REQUEST)
+                possible_actions.append(SPAWN_ACTION)
                 if not player.in_spawn_phase:
-                    possible_actions.append(
-                        {"type": Action.BUILD.value, "unit": BuildingType.CITY.value}
+                    possible_actions.append(BUILD_CITY_ACTION)
+                    possible_actions.extend(
+                        AgentAction(Action.ATTACK, idx, enemy.x, enemy.y, 0.2)
+                        for idx, enemy in enumerate(player.enemies)
                     )
-                    for idx, enemy in enumerate(player.enemies):
-                        possible_actions.append(
-                            {
-                                "type": Action.ATTACK.value,
-                                "neighbor_index": idx,
-                                "x": enemy.x,
-                                "y": enemy.y,
-                                "ratio": 0.2,
-                            }
-                        )
             case "high" | _:
                 if player.in_spawn_phase and player.owned_count == 0:
-                    possible_actions = [SPAWN_REQUEST]
+                    possible_actions = [SPAWN_ACTION]
                 elif player.enemies:
                     city_cost = calculate_building_cost(
                         BuildingType.CITY, player.city_count
                     )
 
                     if player.gold >= city_cost:
-                        possible_actions.append(
-                            {
-                                "type": Action.BUILD.value,
-                                "unit": BuildingType.CITY.value,
-                            }
-                        )
+                        possible_actions.append(BUILD_CITY_ACTION)
 
                     can_attack = (
                         LEARNING_ASSISTANCE != "high"
@@ -297,48 +319,36 @@ class Agent:
                         >= HIGH_POPULATION_THRESHOLD * player.max_population
                     )
                     if can_attack:
-                        for idx, enemy in enumerate(player.enemies):
-                            possible_actions.append(
-                                {
-                                    "type": Action.ATTACK.value,
-                                    "neighbor_index": idx,
-                                    "x": enemy.x,
-                                    "y": enemy.y,
-                                    "ratio": 0.2,
-                                }
-                            )
+                        possible_actions.extend(
+                            AgentAction(Action.ATTACK, idx, enemy.x, enemy.y, 0.2)
+                            for idx, enemy in enumerate(player.enemies)
+                        )
 
         return possible_actions
 
     async def select_action(self, possible_actions):
-        best_action_key = None
+        player = self.env.current_player
+        action_keys = [
+            get_action_key(a, player, calculate_neighbor_ratio)
+            for a in possible_actions
+        ]
 
+        idx = None
         if random.random() >= self.epsilon:
-            best_action_key = await self.best_action()
-
-        action = None
-        if best_action_key is not None:
-            player = PlayerState(self.env.current_state or {})
-            action = next(
-                (
-                    a
-                    for a in possible_actions
-                    if get_action_key(a, player, calculate_neighbor_ratio)
-                    == best_action_key
-                ),
-                None,
-            )
+            idx = self.best_action(action_keys)
 
-        if action is None:
-            self.random_actions += 1
-            action = random.choice(possible_actions)
-        else:
+        if idx is not None:
             self.qtable_actions += 1
+        else:
+            idx = random.randrange(len(possible_actions))
+            self.random_actions += 1
+        action = possible_actions[idx]
+        self.action_key = action_keys[idx]
 
-        action_type = action.get("type")
-        if action_type == Action.NONE.value:
+        action_type = action.type
+        if action_type == Action.NONE:
             self.wait_actions += 1
-        elif action_type == Action.ATTACK.value:
+        elif action_type == Action.ATTACK:
             self.attack_actions += 1
 
         return action
@@ -361,7 +371,13 @@ async def run_main() -> None:
     elif MODE == "interface":
         server_iface = ServerInterface(agent, env)
         print(f"Starting interface websocket server on 0.0.0.0:{INTERFACE_PORT}")
-        async with serve(server_iface.handle_connection, "0.0.0.0", INTERFACE_PORT):
+        async with serve(
+            server_iface.handle_connection,
+            "0.0.0.0",
+            INTERFACE_PORT,
+            compression=None,
+            write_limit=WS_WRITE_LIMIT,
+        ):
             await asyncio.Future()
     else:
         print(f"Unknown MODE '{MODE}', exiting.")
@@ -370,6 +386,6 @@ async def run_main() -> None:
 
 if __name__ == "__main__":
     try:
-        asyncio.run(run_main())
+        asyncio.run(run_main(), loop_factory=loop_factory)
     except KeyboardInterrupt:
         print("\nShutdown complete.")